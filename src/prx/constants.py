@@ -4,6 +4,8 @@ from collections import defaultdict
 
 cGpstUtcEpoch = pd.Timestamp(np.datetime64("1980-01-06T00:00:00.000000000"))
 cBdtUtcEpoch = pd.Timestamp(np.datetime64("2006-01-01T00:00:00.000000000"))
+# GPST epoch as int64 nanoseconds since the Unix epoch, for arithmetic on datetime64[ns] arrays
+cGpstUtcEpoch_ns = np.int64(cGpstUtcEpoch.value)
 
 cNanoSecondsPerSecond = 1e9
 cMicrosecondsPerSecond = 1e6
@@ -12,6 +14,7 @@ cSecondsPerMinute = 60
 cSecondsPerHour = 60 * cSecondsPerMinute
 cSecondsPerWeek = 7 * cSecondsPerDay
 cNanoSecondsPerWeek = cSecondsPerWeek * cNanoSecondsPerSecond
+cNanoSecondsPerWeekInt64 = np.int64(cSecondsPerWeek) * np.int64(cNanoSecondsPerSecond)
 cMetersPerKilometer = 1e3
 cHzPerMhz = 1e6
 # WGS84 Geoid constants
@@ -41,6 +44,11 @@ cQzssPi = cGpsPi
 cQzssSpeedOfLight_mps = cGpsSpeedOfLight_mps
 cQzssMuEarth_m3ps2 = 3.986005e14
 cQzssOmegaDotEarth_rps = 7.2921151467e-5
+# GLONASS ICD (PZ-90) constants
+cGloMuEarth_m3ps2 = 398600.4418 * 1e9
+cGloEarthSemiMajorAxis_m = 6378136.0
+cGloJ2 = 1.0826257 * 1e-3
+cGloOmegaDotEarth_rps = 7.292115 * 1e-5
 # Heuristic: demand micrometer precision in computations involving distances
 cPrxPrecision_m = 1e-6
 cMaxOrbitalSpeedOfAnyGnssSatellite_mps = 1e4
@@ -95,6 +103,76 @@ def carrier_frequencies_hz():
     return dict(cf)
 
 
+# Carrier frequencies looked up per observation, e.g. when building prx records, so we build a
+# (constellation, band, frequency slot) table once instead of walking the nested dictionaries.
+# Bands that don't depend on the frequency slot have the same frequency in every slot.
+carrier_frequency_table_constellations = pd.Index(["G", "R", "E", "S", "J", "C", "I"])
+carrier_frequency_table_bands = pd.Index(
+    ["L1", "L2", "L3", "L4", "L5", "L6", "L7", "L8", "S"]
+)
+carrier_frequency_table_frequency_slots = pd.Index(range(-7, 12 + 1))
+
+
+def build_carrier_frequency_table_hz():
+    cf = carrier_frequencies_hz()
+    table = np.full(
+        (
+            len(carrier_frequency_table_constellations),
+            len(carrier_frequency_table_bands),
+            len(carrier_frequency_table_frequency_slots),
+        ),
+        np.nan,
+    )
+    for i_constellation, constellation in enumerate(
+        carrier_frequency_table_constellations
+    ):
+        for i_band, band in enumerate(carrier_frequency_table_bands):
+            if band not in cf[constellation]:
+                continue
+            slot_2_frequency = cf[constellation][band]
+            if len(slot_2_frequency) == 1:
+                table[i_constellation, i_band, :] = slot_2_frequency[1]
+                continue
+            for i_slot, slot in enumerate(carrier_frequency_table_frequency_slots):
+                table[i_constellation, i_band, i_slot] = slot_2_frequency[slot]
+    table.setflags(write=False)
+    return table
+
+
+carrier_frequency_table_hz = build_carrier_frequency_table_hz()
+
+
+def carrier_frequency_hz(constellation, band, frequency_slot=1):
+    """Look up carrier frequencies in carrier_frequency_table_hz.
+
+    Works on scalars as well as on array-likes, which are broadcast against each other.
+    Returns NaN for unknown constellations, bands or frequency slots, and for NaN frequency slots.
+
+    Example: carrier_frequency_hz(["G", "R"], "L1", [1, -7])
+    """
+
+    def table_index(labels, values):
+        return np.reshape(labels.get_indexer(np.ravel(values)), np.shape(values))
+
+    i_constellation, i_band, slot = np.broadcast_arrays(
+        table_index(carrier_frequency_table_constellations, constellation),
+        table_index(carrier_frequency_table_bands, band),
+        np.asarray(frequency_slot, dtype=float),
+    )
+    i_slot = slot - carrier_frequency_table_frequency_slots[0]
+    is_known = (
+        (i_constellation >= 0)
+        & (i_band >= 0)
+        & (i_slot >= 0)
+        & (i_slot < len(carrier_frequency_table_frequency_slots))
+    )
+    frequency_hz = np.full(i_constellation.shape, np.nan)
+    frequency_hz[is_known] = carrier_frequency_table_hz[
+        i_constellation[is_known], i_band[is_known], i_slot[is_known].astype(int)
+    ]
+    return frequency_hz[()]
+
+
 constellation_2_system_time_scale = {
     "G": "GPST",
     "S": "SBAST",
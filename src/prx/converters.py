@@ -3,6 +3,7 @@ import glob
 import itertools
 import subprocess
 import gzip
+import shutil
 import zipfile
 from prx.helpers import get_logger
 from prx.util import (
@@ -15,13 +16,21 @@ from prx.util import (
 log = get_logger(__name__)
 
 
+def write_atomically(input_stream, output_file: Path):
+    # Write to a temporary file first, so that an interrupted write does not leave a truncated
+    # output file behind.
+    temporary_file = output_file.with_name(f"{output_file.name}.part")
+    with open(temporary_file, "wb") as output_stream:
+        shutil.copyfileobj(input_stream, output_stream)
+    temporary_file.replace(output_file)
+
+
 def compressed_to_uncompressed(file: Path):
     assert file.exists(), "File does not exist"
     if str(file).endswith(".gz"):
         uncompressed_file = Path(str(file).replace(".gz", ""))
         with gzip.open(file, "rb") as compressed_file:
-            with open(uncompressed_file, "wb") as output_file:
-                output_file.write(compressed_file.read())
+            write_atomically(compressed_file, uncompressed_file)
         log.info(f"Uncompressed {file} to {uncompressed_file}")
         return uncompressed_file
     if str(file).endswith(".zip"):
@@ -30,7 +39,8 @@ def compressed_to_uncompressed(file: Path):
                 len(archive.namelist()) == 1
             ), "Not expecting more than one file in archive here."
             uncompressed_file = file.parent.joinpath(archive.namelist()[0])
-            archive.extract(uncompressed_file.name, uncompressed_file.parent)
+            with archive.open(archive.namelist()[0]) as compressed_file:
+                write_atomically(compressed_file, uncompressed_file)
         log.info(f"Uncompressed {file} to {uncompressed_file}")
         return uncompressed_file
     return None
@@ -1,6 +1,6 @@
 import platform
 import re
-from functools import wraps
+from functools import lru_cache, wraps
 from pathlib import Path
 import logging
 
@@ -57,6 +57,7 @@ def get_logger(label):
     return logging.getLogger(label)
 
 
+@lru_cache(maxsize=1)
 def prx_repository_root() -> Path:
     return Path(__file__).parents[2]
 
@@ -147,6 +148,45 @@ def timedelta_2_seconds(time_delta: pd.Timedelta):
     return integer_seconds + fractional_seconds
 
 
+def timedeltas_2_seconds(time_deltas: pd.Series):
+    """Vectorized timedelta_2_seconds(), working on int64 nanoseconds instead of one pd.Timedelta at a time.
+
+    NaT yields NaN.
+    """
+    time_deltas = pd.to_timedelta(time_deltas)
+    nanoseconds = (
+        time_deltas.to_numpy(dtype="timedelta64[ns]").view(np.int64).astype(np.float64)
+    )
+    integer_seconds = np.round(nanoseconds / constants.cNanoSecondsPerSecond)
+    fractional_seconds = (
+        nanoseconds - integer_seconds * constants.cNanoSecondsPerSecond
+    ) / constants.cNanoSecondsPerSecond
+    seconds = integer_seconds + fractional_seconds
+    seconds[pd.isna(time_deltas).to_numpy()] = np.nan
+    return pd.Series(seconds, index=time_deltas.index)
+
+
+def timestamps_2_gpst_weeks_and_seconds(timestamps: pd.Series):
+    """Vectorized timedelta_2_weeks_and_seconds() of `timestamps` w.r.t. the GPST epoch.
+
+    Works on int64 nanoseconds, so that seconds of week keep nanosecond resolution. NaT yields NaN.
+    """
+    is_nat = pd.isna(timestamps).to_numpy()
+    nanoseconds = (
+        pd.to_datetime(timestamps).to_numpy(dtype="datetime64[ns]").view(np.int64)
+        - constants.cGpstUtcEpoch_ns
+    )
+    weeks = (nanoseconds // constants.cNanoSecondsPerWeekInt64).astype(np.float64)
+    seconds = (
+        nanoseconds % constants.cNanoSecondsPerWeekInt64
+    ) / constants.cNanoSecondsPerSecond
+    weeks[is_nat] = np.nan
+    seconds[is_nat] = np.nan
+    return pd.Series(weeks, index=timestamps.index), pd.Series(
+        seconds, index=timestamps.index
+    )
+
+
 def timedelta_2_nanoseconds(time_delta: pd.Timedelta):
     assert isinstance(
         time_delta, pd.Timedelta
@@ -339,9 +379,9 @@ def compute_satellite_elevation_and_azimuth(sat_pos_ecef, receiver_pos_ecef):
     GNSS Data Processing, Vol. I: Fundamentals and Algorithms. Equations (B.9),(B.13),(B.14)
     """
     sat_pos_wrt_rx_pos_ecef = sat_pos_ecef - receiver_pos_ecef
-    sat_pos_wrt_rx_pos_norm = np.linalg.norm(sat_pos_wrt_rx_pos_ecef, axis=1)[
-        :, np.newaxis
-    ]
+    sat_pos_wrt_rx_pos_norm = np.sqrt(
+        np.einsum("ij,ij->i", sat_pos_wrt_rx_pos_ecef, sat_pos_wrt_rx_pos_ecef)
+    )[:, np.newaxis]
     unit_vector_rx_satellite_ecef = sat_pos_wrt_rx_pos_ecef / sat_pos_wrt_rx_pos_norm
     [receiver_lat_rad, receiver_lon_rad, __] = ecef_2_geodetic(receiver_pos_ecef)
     unit_e_ecef = [-np.sin(receiver_lon_rad), np.cos(receiver_lon_rad), 0]
@@ -406,23 +406,13 @@ def build_records(
         how="left",
     )
 
-    carrier_freqs = constants.carrier_frequencies_hz()
-
-    def signal_2_carrier_frequency(row):
-        constellation = row.satellite[0]
-        frequency = "L" + row.observation_type[1]
-        frequency_slot = row["frequency_slot"]
-        if np.isnan(row["frequency_slot"]):
-            return np.nan
-        # GLONASS satellites with both FDMA and CDMA signals have a frequency slot for FDMA signals,
-        # for CDMA signals we use the common carrier frequency of those signals
-        if len(carrier_freqs[constellation][frequency]) == 1:
-            return carrier_freqs[constellation][frequency][1]
-        else:
-            return carrier_freqs[constellation][frequency][frequency_slot]
-
-    flat_obs.loc[:, "carrier_frequency_hz"] = flat_obs.apply(
-        signal_2_carrier_frequency, axis=1
+    # GLONASS satellites with both FDMA and CDMA signals have a frequency slot for FDMA signals,
+    # for CDMA signals the carrier frequency table holds the common carrier frequency of those signals
+    # in every slot.
+    flat_obs.loc[:, "carrier_frequency_hz"] = constants.carrier_frequency_hz(
+        flat_obs.satellite.str[0].to_numpy(),
+        ("L" + flat_obs.observation_type.str[1]).to_numpy(),
+        flat_obs.frequency_slot.to_numpy(),
     )
     # create a dictionary containing the headers of the different NAV files.
     # The keys are the "YYYYDDD" (year and day of year) and are located at
@@ -448,15 +438,9 @@ def build_records(
         if "IONOSPHERIC CORR" in nav_header_dict[f"{year:03d}" + f"{doy:03d}"]:
             log.info(f"Computing iono delay for {year}-{doy:03d}")
             time_of_emission_weeksecond_isagpst = (
-                flat_obs.loc[mask]
-                .apply(
-                    lambda row: helpers.timedelta_2_weeks_and_seconds(
-                        row.time_of_emission_isagpst
-                        - constants.system_time_scale_rinex_utc_epoch["GPST"]
-                    )[1],
-                    axis=1,
-                )
-                .to_numpy()
+                helpers.timestamps_2_gpst_weeks_and_seconds(
+                    flat_obs.loc[mask].time_of_emission_isagpst
+                )[1].to_numpy()
             )
 
             flat_obs.loc[
@@ -475,7 +459,7 @@ def build_records(
                 latitude_user_rad,
                 longitude_user_rad,
             ) * (
-                constants.carrier_frequencies_hz()["G"]["L1"][1] ** 2
+                constants.carrier_frequency_hz("G", "L1") ** 2
                 / flat_obs.loc[mask].carrier_frequency_hz ** 2
             )
         else:
@@ -1,30 +1,46 @@
+import functools
 import multiprocessing
+from dataclasses import dataclass, fields
 
 import pandas as pd
 import numpy as np
 from pathlib import Path
-import scipy
 from joblib import Parallel, delayed
 
 from prx import helpers
 from prx import constants
+from prx.rinex_nav import kernels
+from prx.rinex_nav.parser import parse as prx_nav_parse
 from prx.helpers import timeit, parse_rinex_file
 
 log = helpers.get_logger(__name__)
 
 
-@timeit
-def parse_rinex_nav_file(rinex_file: Path):
-    @helpers.disk_cache.cache(ignore=["rinex_file_path"])
-    def cached_load(rinex_file_path: Path, file_hash: str):
-        ds = parse_rinex_file(rinex_file_path)
-        ds.attrs["utc_gpst_leap_seconds"] = helpers.get_gpst_utc_leap_seconds(
-            rinex_file_path
+@helpers.disk_cache.cache(ignore=["rinex_file_path"])
+def load_rinex_nav_file(rinex_file_path: Path, file_hash: str):
+    helpers.repair_with_gfzrnx(rinex_file_path)
+    try:
+        df = prx_nav_parse(rinex_file_path)
+    except ValueError as e:
+        log.warning(
+            f"Could not parse {rinex_file_path} with prx's parser ({e}), falling back to georinex"
         )
-        df = convert_nav_dataset_to_dataframe(ds)
-        df["ephemeris_hash"] = pd.util.hash_pandas_object(df, index=False).astype(str)
-        return df
+        df = nav_dataset_to_dataframe(parse_rinex_file(rinex_file_path))
+    df["source"] = rinex_file_path.name
+    df = convert_nav_dataframe(df, helpers.get_gpst_utc_leap_seconds(rinex_file_path))
+    df["ephemeris_hash"] = pd.util.hash_pandas_object(df, index=False).astype(str)
+    return df
+
+
+# Keep recently parsed navigation files in memory, so that evaluating the same file repeatedly in one
+# process does not reload the DataFrame from the disk cache every time.
+@functools.lru_cache(maxsize=8)
+def load_rinex_nav_file_in_memory(rinex_file_path: Path, file_hash: str):
+    return load_rinex_nav_file(rinex_file_path, file_hash)
 
+
+@timeit
+def parse_rinex_nav_file(rinex_file: Path):
     t0 = pd.Timestamp.now()
 
     file_content_hash = helpers.hash_of_file_content(rinex_file)
@@ -33,7 +49,8 @@ def parse_rinex_nav_file(rinex_file: Path):
         log.info(
             f"Hashing file content took {hash_time}, we might want to partially hash the file"
         )
-    return cached_load(rinex_file, file_content_hash)
+    # Return a copy so that callers modifying the DataFrame do not modify the in-memory cache
+    return load_rinex_nav_file_in_memory(Path(rinex_file), file_content_hash).copy()
 
 
 def time_scale_integer_second_offset_wrt_gpst(time_scale, utc_gpst_leap_seconds=None):
@@ -49,66 +66,57 @@ def time_scale_integer_second_offset_wrt_gpst(time_scale, utc_gpst_leap_seconds=
     assert False, f"Unexpected time scale: {time_scale}"
 
 
-def glonass_xdot_rtklib(x, acc_sun_moon):
-    p = x[["X", "Y", "Z"]]
-    v = x[["dX", "dY", "dZ"]]
-    GM_e = 398600.4418 * 1e9
-    R_e = 6378136.0
-    J_2 = 1.0826257 * 1e-3
-    omega_e = 7.292115 * 1e-5
-    xdot = x.copy() * np.nan
-    xdot[["X", "Y", "Z"]] = x[["dX", "dY", "dZ"]]
-    r = np.linalg.norm(p.to_numpy(), axis=1)
+# pv: np.array of shape (n, 6) with ECEF positions and velocities, acc_sun_moon: np.array of shape (n, 3)
+def glonass_xdot_rtklib(pv, acc_sun_moon):
+    p = pv[:, 0:3]
+    v = pv[:, 3:6]
+    GM_e = constants.cGloMuEarth_m3ps2
+    R_e = constants.cGloEarthSemiMajorAxis_m
+    J_2 = constants.cGloJ2
+    omega_e = constants.cGloOmegaDotEarth_rps
+    xdot = np.empty_like(pv)
+    xdot[:, 0:3] = v
+    r = np.sqrt(np.einsum("ij,ij->i", p, p))
     # How
     # https://github.com/tomojitakasu/RTKLIB/blob/71db0ffa0d9735697c6adfd06fdf766d0e5ce807/src/ephemeris.c#L261
     # computes it:
     a = 1.5 * J_2 * GM_e * (R_e**2 / r**5)
-    b = 5 * p.loc[:, "Z"] ** 2 / r**2
+    b = 5 * p[:, 2] ** 2 / r**2
     c = -GM_e / r**3 - a * (1 - b)
-    xdot.loc[:, "dX"] = (
-        (c + omega_e**2) * p.loc[:, "X"]
-        + 2 * omega_e * v.loc[:, "dY"]
-        + acc_sun_moon.loc[:, "dX2"]
-    )
-    xdot.loc[:, "dY"] = (
-        (c + omega_e**2) * p.loc[:, "Y"]
-        - 2 * omega_e * v.loc[:, "dX"]
-        + acc_sun_moon.loc[:, "dY2"]
-    )
-    xdot.loc[:, "dZ"] = (c - 2 * a) * p.loc[:, "Z"] + acc_sun_moon.loc[:, "dZ2"]
+    xdot[:, 3] = (c + omega_e**2) * p[:, 0] + 2 * omega_e * v[:, 1] + acc_sun_moon[:, 0]
+    xdot[:, 4] = (c + omega_e**2) * p[:, 1] - 2 * omega_e * v[:, 0] + acc_sun_moon[:, 1]
+    xdot[:, 5] = (c - 2 * a) * p[:, 2] + acc_sun_moon[:, 2]
     return xdot
 
 
-def glonass_xdot_montenbruck(x, acc_sun_moon):
-    p = x[["X", "Y", "Z"]]
-    v = x[["dX", "dY", "dZ"]]
-    GM_e = 398600.4418 * 1e9
-    R_e = 6378136.0
-    J_2 = 1.0826257 * 1e-3
-    omega_e = 7.292115 * 1e-5
-    xdot = x.copy() * np.nan
-    xdot[["X", "Y", "Z"]] = x[["dX", "dY", "dZ"]]
-    r = np.linalg.norm(p.to_numpy(), axis=1)
+def glonass_xdot_montenbruck(pv, acc_sun_moon):
+    p = pv[:, 0:3]
+    v = pv[:, 3:6]
+    GM_e = constants.cGloMuEarth_m3ps2
+    R_e = constants.cGloEarthSemiMajorAxis_m
+    J_2 = constants.cGloJ2
+    omega_e = constants.cGloOmegaDotEarth_rps
+    xdot = np.empty_like(pv)
+    xdot[:, 0:3] = v
+    r = np.sqrt(np.einsum("ij,ij->i", p, p))
     # How Montenbruck, 2017, Handbook of GNSS, section 3.3.3 computes it:
     c1 = -GM_e / r**3
-    c2 = -(3 / 2) * J_2 * GM_e * (R_e**2 / r**5) * (1 - (5 * p.loc[:, "Z"] ** 2) / r**2)
-    xdot.loc[:, "dX"] = (
-        c1 * p.loc[:, "X"]
-        + c2 * p.loc[:, "X"]
-        + omega_e**2 * p.loc[:, "X"]
-        + 2 * omega_e * v.loc[:, "dY"]
-        + acc_sun_moon.loc[:, "dX2"]
-    )
-    xdot.loc[:, "dY"] = (
-        c1 * p.loc[:, "Y"]
-        + c2 * p.loc[:, "Y"]
-        + omega_e**2 * p.loc[:, "Y"]
-        - 2 * omega_e * v.loc[:, "dX"]
-        + acc_sun_moon.loc[:, "dY2"]
-    )
-    xdot.loc[:, "dZ"] = (
-        c1 * p.loc[:, "Z"] + c2 * p.loc[:, "Z"] + acc_sun_moon.loc[:, "dZ2"]
-    )
+    c2 = -(3 / 2) * J_2 * GM_e * (R_e**2 / r**5) * (1 - (5 * p[:, 2] ** 2) / r**2)
+    xdot[:, 3] = (
+        c1 * p[:, 0]
+        + c2 * p[:, 0]
+        + omega_e**2 * p[:, 0]
+        + 2 * omega_e * v[:, 1]
+        + acc_sun_moon[:, 0]
+    )
+    xdot[:, 4] = (
+        c1 * p[:, 1]
+        + c2 * p[:, 1]
+        + omega_e**2 * p[:, 1]
+        - 2 * omega_e * v[:, 0]
+        + acc_sun_moon[:, 1]
+    )
+    xdot[:, 5] = c1 * p[:, 2] + c2 * p[:, 2] + acc_sun_moon[:, 2]
     return xdot
 
 
@@ -129,40 +137,61 @@ def sbas_orbit_position_and_velocity(df):
 
 def glonass_orbit_position_and_velocity(df):
     # Based on Montenbruck, 2017, Handbook of GNSS, section 3.3.3
-    pv = df[["X", "Y", "Z", "dX", "dY", "dZ"]]
-    a = df[["dX2", "dY2", "dZ2"]]
-    t = df["query_time_wrt_ephemeris_reference_time_s"] * 0
-    t_query = df["query_time_wrt_ephemeris_reference_time_s"]
+    pv = df[["X", "Y", "Z", "dX", "dY", "dZ"]].to_numpy(dtype=np.float64)
+    a = df[["dX2", "dY2", "dZ2"]].to_numpy(dtype=np.float64)
+    t_query = df["query_time_wrt_ephemeris_reference_time_s"].to_numpy(dtype=np.float64)
+    fixed_integration_time_step = 60
+    if kernels.numba_available:
+        pv = kernels.glonass_orbit_rk4(
+            np.ascontiguousarray(pv),
+            np.ascontiguousarray(a),
+            np.ascontiguousarray(t_query),
+            fixed_integration_time_step,
+        )
+    else:
+        pv = glonass_orbit_rk4(pv, a, t_query, fixed_integration_time_step)
+    df[
+        [
+            "sat_pos_x_m",
+            "sat_pos_y_m",
+            "sat_pos_z_m",
+            "sat_vel_x_mps",
+            "sat_vel_y_mps",
+            "sat_vel_z_mps",
+        ]
+    ] = pv
+    return df
 
+
+def glonass_orbit_rk4(pv, a, t_query, fixed_integration_time_step):
+    t = np.zeros_like(t_query)
     while True:
         # We integrate in fixed steps until the last step, which is the time between the next-to-last integrated state
         # and the query time.
-        fixed_integration_time_step = 60
-        h = (t_query - t).clip(0, fixed_integration_time_step)
+        h = np.clip(t_query - t, 0, fixed_integration_time_step)
         if np.all(h == 0):
-            df[
-                [
-                    "sat_pos_x_m",
-                    "sat_pos_y_m",
-                    "sat_pos_z_m",
-                    "sat_vel_x_mps",
-                    "sat_vel_y_mps",
-                    "sat_vel_z_mps",
-                ]
-            ] = pv
-
-            return df
+            return pv
         # One step of 4th order Runge-Kutta integration:
         glonass_xdot = glonass_xdot_rtklib
+        h_column = h[:, np.newaxis]
         k1 = glonass_xdot(pv, a)
-        k2 = glonass_xdot(pv + k1.mul(h / 2, axis=0), a)
-        k3 = glonass_xdot(pv + k2.mul(h / 2, axis=0), a)
-        k4 = glonass_xdot(pv + k3.mul(h, axis=0), a)
-        pv = pv + (k1 + 2 * k2 + 2 * k3 + k4).mul(h / 6, axis=0)
+        k2 = glonass_xdot(pv + k1 * (h_column / 2), a)
+        k3 = glonass_xdot(pv + k2 * (h_column / 2), a)
+        k4 = glonass_xdot(pv + k3 * h_column, a)
+        pv = pv + (k1 + 2 * k2 + 2 * k3 + k4) * (h_column / 6)
         t = t + h
 
 
 def eccentric_anomaly(M, e, tol=1e-5, max_iter=10):
+    if kernels.numba_available:
+        E, converged = kernels.eccentric_anomaly(
+            np.ascontiguousarray(M, dtype=np.float64),
+            np.ascontiguousarray(e, dtype=np.float64),
+            tol,
+            max_iter,
+        )
+        assert converged, "Eccentric Anomaly may not have converged"
+        return E
     E = M.copy()
     for iterations in range(0, max_iter):
         delta_E = -(E - e * np.sin(E) - M) / (1 - e * np.cos(E))
@@ -197,194 +226,268 @@ def is_bds_geo(constellation, inclination_rad, semi_major_axis_m):
     return is_geo
 
 
-def position_in_orbital_plane(eph):
+@dataclass
+class KeplerOrbits:
+    """Broadcast Kepler orbit parameters of a set of (satellite, query time) pairs.
+
+    Holds one contiguous float64 array per parameter, so that the orbit computations below work on
+    plain NumPy arrays instead of going through pandas for every column access.
+    """
+
+    constellation: np.ndarray
+    # Time since ephemeris reference epoch
+    t_k: np.ndarray
+    t_oe: np.ndarray
+    sqrtA: np.ndarray
+    e: np.ndarray
+    M_0: np.ndarray
+    deltaN: np.ndarray
+    omega: np.ndarray
+    Omega_0: np.ndarray
+    OmegaDot: np.ndarray
+    i_0: np.ndarray
+    IDOT: np.ndarray
+    C_us: np.ndarray
+    C_uc: np.ndarray
+    C_rs: np.ndarray
+    C_rc: np.ndarray
+    C_is: np.ndarray
+    C_ic: np.ndarray
+    MuEarthIcd_m3ps2: np.ndarray
+    OmegaEarthIcd_rps: np.ndarray
+
+    @classmethod
+    def from_dataframe(cls, eph):
+        def column(values):
+            return np.ascontiguousarray(values, dtype=np.float64)
+
+        return cls(
+            constellation=eph.constellation.to_numpy(),
+            t_k=column(eph.query_time_wrt_ephemeris_reference_time_s),
+            OmegaEarthIcd_rps=column(
+                eph.constellation.map(
+                    {
+                        "C": constants.cBdsOmegaDotEarth_rps,
+                        "G": constants.cGpsOmegaDotEarth_rps,
+                        "E": constants.cGalOmegaDotEarth_rps,
+                        "J": constants.cQzssOmegaDotEarth_rps,
+                    }
+                )
+            ),
+            MuEarthIcd_m3ps2=column(
+                eph.constellation.map(
+                    {
+                        "C": constants.cBdsMuEarth_m3ps2,
+                        "G": constants.cGpsMuEarth_m3ps2,
+                        "E": constants.cGalMuEarth_m3ps2,
+                        "J": constants.cQzssMuEarth_m3ps2,
+                    }
+                )
+            ),
+            **{
+                field.name: column(eph[field.name])
+                for field in fields(cls)
+                if field.name
+                not in [
+                    "constellation",
+                    "t_k",
+                    "OmegaEarthIcd_rps",
+                    "MuEarthIcd_m3ps2",
+                ]
+            },
+        )
+
+
+@dataclass
+class OrbitalPlaneStates:
+    """Satellite positions and velocities in the orbital plane, and what we need to rotate them
+    into the Earth-centered frame."""
+
+    x_k: np.ndarray
+    y_k: np.ndarray
+    dx_k: np.ndarray
+    dy_k: np.ndarray
+    # Corrected inclination and its derivative
+    i_k: np.ndarray
+    di_k: np.ndarray
     # Semi-major axis
-    eph["A"] = eph.sqrtA**2
+    A: np.ndarray
+
+
+def position_in_orbital_plane(o: KeplerOrbits):
+    # Semi-major axis
+    A = o.sqrtA**2
     # Computed mean motion
-    n_0 = np.sqrt(eph.MuEarthIcd_m3ps2 / eph.A**3)
-    # Time since ephemeris reference epch
-    eph["t_k"] = eph.query_time_wrt_ephemeris_reference_time_s
+    n_0 = np.sqrt(o.MuEarthIcd_m3ps2 / A**3)
     # Corrected mean motion
-    eph["n"] = n_0 + eph.deltaN
+    n = n_0 + o.deltaN
     # Computed mean anomaly
-    M_k = eph.M_0 + (eph.n * eph.t_k)
+    M_k = o.M_0 + (n * o.t_k)
     # Eccentric Anomaly
-    eph["E_k"] = eccentric_anomaly(M_k.to_numpy(), eph.e.to_numpy())
+    E_k = eccentric_anomaly(M_k, o.e)
     # Computed true anomaly
-    eph["nu_k"] = 2 * np.arctan(
-        np.sqrt((1 + eph.e) / (1 - eph.e)) * np.tan(eph.E_k / 2)
-    )
+    nu_k = 2 * np.arctan(np.sqrt((1 + o.e) / (1 - o.e)) * np.tan(E_k / 2))
     # Computed argument of latitude
-    eph["phi_k"] = eph.nu_k + eph.omega
+    phi_k = nu_k + o.omega
+    # Each sine and cosine below is computed once, as they dominate the cost of this function
+    sin_2phi_k = np.sin(2 * phi_k)
+    cos_2phi_k = np.cos(2 * phi_k)
     # Argument of latitude correction
-    delta_u_k = eph.C_us * np.sin(2 * eph.phi_k) + eph.C_uc * np.cos(2 * eph.phi_k)
+    delta_u_k = o.C_us * sin_2phi_k + o.C_uc * cos_2phi_k
     # Radius correction
-    delta_r_k = eph.C_rs * np.sin(2 * eph.phi_k) + eph.C_rc * np.cos(2 * eph.phi_k)
+    delta_r_k = o.C_rs * sin_2phi_k + o.C_rc * cos_2phi_k
     # Inclination correction
-    delta_i_k = eph.C_is * np.sin(2 * eph.phi_k) + eph.C_ic * np.cos(2 * eph.phi_k)
+    delta_i_k = o.C_is * sin_2phi_k + o.C_ic * cos_2phi_k
     # Corrected argument of latitude
-    eph["u_k"] = eph.phi_k + delta_u_k
+    u_k = phi_k + delta_u_k
+    sin_u_k = np.sin(u_k)
+    cos_u_k = np.cos(u_k)
+    one_minus_e_cos_E_k = 1 - o.e * np.cos(E_k)
     # Corrected radius
-    eph["r_k"] = eph.A * (1 - eph.e * np.cos(eph.E_k)) + delta_r_k
+    r_k = A * one_minus_e_cos_E_k + delta_r_k
     # Corrected inclination
-    eph["i_k"] = eph.i_0 + eph.IDOT * eph.t_k + delta_i_k
+    i_k = o.i_0 + o.IDOT * o.t_k + delta_i_k
     # Satellite positions in the orbital plane
-    eph["x_k"] = eph.r_k * np.cos(eph.u_k)
-    eph["y_k"] = eph.r_k * np.sin(eph.u_k)
+    x_k = r_k * cos_u_k
+    y_k = r_k * sin_u_k
     # Derivatives for velocity computation, from
     # IS-GPS-200N, Table 20-IV
-    eph["dE_k"] = eph.n / (1 - eph.e * np.cos(eph.E_k))
-    eph["dnu_k"] = eph.dE_k * np.sqrt(1 - eph.e**2) / (1 - eph.e * np.cos(eph.E_k))
-    eph["di_k"] = eph.IDOT + 2 * eph.dnu_k * (
-        eph.C_is * np.cos(2.0 * eph.phi_k) - eph.C_ic * np.sin(2.0 * eph.phi_k)
-    )
-    eph["du_k"] = eph.dnu_k + 2 * eph.dnu_k * (
-        eph.C_us * np.cos(2.0 * eph.phi_k) - eph.C_uc * np.sin(2.0 * eph.phi_k)
+    dE_k = n / one_minus_e_cos_E_k
+    dnu_k = dE_k * np.sqrt(1 - o.e**2) / one_minus_e_cos_E_k
+    di_k = o.IDOT + 2 * dnu_k * (o.C_is * cos_2phi_k - o.C_ic * sin_2phi_k)
+    du_k = dnu_k + 2 * dnu_k * (o.C_us * cos_2phi_k - o.C_uc * sin_2phi_k)
+    dr_k = (o.e * A * dE_k * np.sin(E_k)) + 2 * dnu_k * (
+        o.C_rs * cos_2phi_k - o.C_rc * sin_2phi_k
     )
-    eph["dr_k"] = (eph.e * eph.A * eph.dE_k * np.sin(eph.E_k)) + 2 * eph.dnu_k * (
-        eph.C_rs * np.cos(2.0 * eph.phi_k) - eph.C_rc * np.sin(2.0 * eph.phi_k)
+    dx_k = dr_k * cos_u_k - r_k * du_k * sin_u_k
+    dy_k = dr_k * sin_u_k + r_k * du_k * cos_u_k
+    return OrbitalPlaneStates(
+        x_k=x_k, y_k=y_k, dx_k=dx_k, dy_k=dy_k, i_k=i_k, di_k=di_k, A=A
     )
-    eph["dx_k"] = eph.dr_k * np.cos(eph.u_k) - eph.r_k * eph.du_k * np.sin(eph.u_k)
-    eph["dy_k"] = eph.dr_k * np.sin(eph.u_k) + eph.r_k * eph.du_k * np.cos(eph.u_k)
-    # We need to know which orbits are Beidou GEOs later on
-    eph["is_bds_geo"] = is_bds_geo(eph.constellation, eph.i_k, eph.A)
 
 
-def orbital_plane_to_earth_centered_cartesian(eph):
+def orbital_plane_to_earth_centered_cartesian(
+    o: KeplerOrbits, p: OrbitalPlaneStates, is_geo
+):
     # Corrected longitude of ascending node in ECEF
-    eph["Omega_k"] = (
-        eph.Omega_0
-        + (eph.OmegaDot - eph.OmegaEarthIcd_rps) * eph.t_k
-        - eph.OmegaEarthIcd_rps * eph.t_oe
-    )
-    # Note that eph.loc[eph.is_bds_geo]["Omega_k"] would modify a copy of the GEO slice, not the original DataFrame.
-    eph.loc[eph.is_bds_geo, "Omega_k"] = (
-        eph[eph.is_bds_geo].Omega_0
-        + eph[eph.is_bds_geo].OmegaDot * eph[eph.is_bds_geo].t_k
-        - eph[eph.is_bds_geo].OmegaEarthIcd_rps * eph[eph.is_bds_geo].t_oe
-    )
-    eph["dOmega_k"] = eph.OmegaDot - eph.OmegaEarthIcd_rps
-    eph.loc[eph.is_bds_geo, "dOmega_k"] = eph[eph.is_bds_geo].OmegaDot
+    Omega_k = (
+        o.Omega_0
+        + (o.OmegaDot - o.OmegaEarthIcd_rps) * o.t_k
+        - o.OmegaEarthIcd_rps * o.t_oe
+    )
+    dOmega_k = o.OmegaDot - o.OmegaEarthIcd_rps
+    # For BDS GEOs, the ascending node does not include the Earth's rotation since the reference epoch
+    Omega_k[is_geo] = (
+        o.Omega_0[is_geo]
+        + o.OmegaDot[is_geo] * o.t_k[is_geo]
+        - o.OmegaEarthIcd_rps[is_geo] * o.t_oe[is_geo]
+    )
+    dOmega_k[is_geo] = o.OmegaDot[is_geo]
     # Satellite positions in cartesian frame (for BDS GEOs this is a particular inertial
     # frame, for others the system ECEF frame)
     # For BDS GEOs we apply an additional rotation later-on to compute their position in Beidou's ECEF frame.
-    eph["X_k"] = eph.x_k * np.cos(eph.Omega_k) - eph.y_k * np.cos(eph.i_k) * np.sin(
-        eph.Omega_k
-    )
-    eph["Y_k"] = eph.x_k * np.sin(eph.Omega_k) + eph.y_k * np.cos(eph.i_k) * np.cos(
-        eph.Omega_k
-    )
-    eph["Z_k"] = eph.y_k * np.sin(eph.i_k)
+    sin_Omega_k = np.sin(Omega_k)
+    cos_Omega_k = np.cos(Omega_k)
+    sin_i_k = np.sin(p.i_k)
+    cos_i_k = np.cos(p.i_k)
+    X_k = p.x_k * cos_Omega_k - p.y_k * cos_i_k * sin_Omega_k
+    Y_k = p.x_k * sin_Omega_k + p.y_k * cos_i_k * cos_Omega_k
+    Z_k = p.y_k * sin_i_k
     # ECEF velocity, from
     # IS-GPS-200N, Table 20-IV
-    eph["dX_k"] = (
-        -eph.x_k * eph.dOmega_k * np.sin(eph.Omega_k)
-        + eph.dx_k * np.cos(eph.Omega_k)
-        - eph.dy_k * np.sin(eph.Omega_k) * np.cos(eph.i_k)
-        - eph.y_k * eph.dOmega_k * np.cos(eph.Omega_k) * np.cos(eph.i_k)
-        + eph.y_k * eph.di_k * np.sin(eph.Omega_k) * np.sin(eph.i_k)
-    )
-    eph["dY_k"] = (
-        eph.x_k * eph.dOmega_k * np.cos(eph.Omega_k)
-        - eph.y_k * eph.dOmega_k * np.sin(eph.Omega_k) * np.cos(eph.i_k)
-        - eph.y_k * eph.di_k * np.cos(eph.Omega_k) * np.sin(eph.i_k)
-        + eph.dx_k * np.sin(eph.Omega_k)
-        + eph.dy_k * np.cos(eph.Omega_k) * np.cos(eph.i_k)
-    )
-
-    eph["dZ_k"] = eph.y_k * eph.di_k * np.cos(eph.i_k) + eph.dy_k * np.sin(eph.i_k)
-    pass
+    dX_k = (
+        -p.x_k * dOmega_k * sin_Omega_k
+        + p.dx_k * cos_Omega_k
+        - p.dy_k * sin_Omega_k * cos_i_k
+        - p.y_k * dOmega_k * cos_Omega_k * cos_i_k
+        + p.y_k * p.di_k * sin_Omega_k * sin_i_k
+    )
+    dY_k = (
+        p.x_k * dOmega_k * cos_Omega_k
+        - p.y_k * dOmega_k * sin_Omega_k * cos_i_k
+        - p.y_k * p.di_k * cos_Omega_k * sin_i_k
+        + p.dx_k * sin_Omega_k
+        + p.dy_k * cos_Omega_k * cos_i_k
+    )
+    dZ_k = p.y_k * p.di_k * cos_i_k + p.dy_k * sin_i_k
+    return np.column_stack((X_k, Y_k, Z_k)), np.column_stack((dX_k, dY_k, dZ_k))
 
 
-def handle_bds_geos(eph):
+def handle_bds_geos(o: KeplerOrbits, is_geo, P, V):
     # Do special rotation from inertial to BDCS (ECEF) frame for Beidou GEO satellites, see
     # Beidou_ICD_B3I_v1.0, Table 5-11
-    geos = eph[eph.is_bds_geo]
-    if geos.empty:
+    if not is_geo.any():
         return
-    P_GK = np.reshape(geos[["X_k", "Y_k", "Z_k"]].to_numpy(), (-1, 1))
-    V_GK = np.reshape(geos[["dX_k", "dY_k", "dZ_k"]].to_numpy(), (-1, 1))
-    z_angles = geos.OmegaEarthIcd_rps * geos.t_k
-    rotation_matrices = []
-    for i, z_angle in enumerate(z_angles):
-        x_angle = helpers.deg_2_rad(-5.0)
-        Rx = np.array(
-            [
-                [1, 0, 0],
-                [0, np.cos(x_angle), np.sin(x_angle)],
-                [0, -np.sin(x_angle), np.cos(x_angle)],
-            ]
-        )
-        Rz = np.array(
-            [
-                [np.cos(z_angle), np.sin(z_angle), 0],
-                [-np.sin(z_angle), np.cos(z_angle), 0],
-                [0, 0, 1],
-            ]
-        )
-        rotation_matrices.append(np.matmul(Rz, Rx))
-    R = scipy.linalg.block_diag(*rotation_matrices)
-    P_K = np.matmul(R, P_GK)
-    P_K = np.reshape(P_K, (-1, 3))
-    geos["X_k"] = P_K[:, 0]
-    geos["Y_k"] = P_K[:, 1]
-    geos["Z_k"] = P_K[:, 2]
+    P_GK = P[is_geo]
+    V_GK = V[is_geo]
+    omega_earth_rps = o.OmegaEarthIcd_rps[is_geo]
+    z_angles = omega_earth_rps * o.t_k[is_geo]
+    x_angle = helpers.deg_2_rad(-5.0)
+    Rx = np.array(
+        [
+            [1, 0, 0],
+            [0, np.cos(x_angle), np.sin(x_angle)],
+            [0, -np.sin(x_angle), np.cos(x_angle)],
+        ]
+    )
+    # One rotation matrix per GEO, stacked into an array of shape (n, 3, 3)
+    Rz = np.zeros((z_angles.size, 3, 3))
+    Rz[:, 0, 0] = np.cos(z_angles)
+    Rz[:, 0, 1] = np.sin(z_angles)
+    Rz[:, 1, 0] = -np.sin(z_angles)
+    Rz[:, 1, 1] = np.cos(z_angles)
+    Rz[:, 2, 2] = 1
+    R = np.matmul(Rz, Rx)
+    P_K = np.einsum("nij,nj->ni", R, P_GK)
     # Velocity in inertial frame that coincides with BDCS at this time, ie a "frozen" ECEF frame
-    V_K_frozen = np.matmul(R, V_GK)
-    V_K_frozen = np.reshape(V_K_frozen, (-1, 3))
-    geos["dX_k"] = V_K_frozen[:, 0]
-    geos["dY_k"] = V_K_frozen[:, 1]
-    geos["dZ_k"] = V_K_frozen[:, 2]
-
+    V_K_frozen = np.einsum("nij,nj->ni", R, V_GK)
     # Add term due to ECEFs angular velocity w.r.t. the frozen frame
-
-    def frozen_to_rotating_bdcs(row):
-        p = np.array([row["X_k"], row["Y_k"], row["Z_k"]])
-        v_frozen = np.array([row["dX_k"], row["dY_k"], row["dZ_k"]])
-        v_rotating = v_frozen + np.cross(np.array([0, 0, -row.OmegaEarthIcd_rps]), p)
-        row[["dX_k", "dY_k", "dZ_k"]] = v_rotating
-        return row
-
-    geos = geos.apply(frozen_to_rotating_bdcs, axis=1)
-    eph[eph.is_bds_geo] = geos
+    omega_earth_vector_rps = np.zeros((z_angles.size, 3))
+    omega_earth_vector_rps[:, 2] = -omega_earth_rps
+    V_K = V_K_frozen + np.cross(omega_earth_vector_rps, P_K)
+    P[is_geo] = P_K
+    V[is_geo] = V_K
 
 
 # Adapted from gnss_lib_py's find_sat()
 def kepler_orbit_position_and_velocity(eph):
-    eph["gps_week"] = eph["GPSWeek"]
-    eph["gnss_id"] = eph["constellation"]
-    eph["sv_id"] = eph["sv"]
+    orbits = KeplerOrbits.from_dataframe(eph)
+    orbital_plane_states = position_in_orbital_plane(orbits)
+    # We need to know which orbits are Beidou GEOs, as those use a different ECEF transformation
+    is_geo = is_bds_geo(
+        orbits.constellation, orbital_plane_states.i_k, orbital_plane_states.A
+    )
+    P, V = orbital_plane_to_earth_centered_cartesian(
+        orbits, orbital_plane_states, is_geo
+    )
+    handle_bds_geos(orbits, is_geo, P, V)
+    eph[["sat_pos_x_m", "sat_pos_y_m", "sat_pos_z_m"]] = P
+    eph[["sat_vel_x_mps", "sat_vel_y_mps", "sat_vel_z_mps"]] = V
+    return eph
 
-    eph["OmegaEarthIcd_rps"] = eph.constellation.map(
-        {
-            "C": constants.cBdsOmegaDotEarth_rps,
-            "G": constants.cGpsOmegaDotEarth_rps,
-            "E": constants.cGalOmegaDotEarth_rps,
-            "J": constants.cQzssOmegaDotEarth_rps,
-        }
-    )
-    eph["MuEarthIcd_m3ps2"] = eph.constellation.map(
-        {
-            "C": constants.cBdsMuEarth_m3ps2,
-            "G": constants.cGpsMuEarth_m3ps2,
-            "E": constants.cGalMuEarth_m3ps2,
-            "J": constants.cQzssMuEarth_m3ps2,
-        }
-    )
-    position_in_orbital_plane(eph)
-    orbital_plane_to_earth_centered_cartesian(eph)
-    handle_bds_geos(eph)
-    eph = eph.rename(
-        columns={
-            "X_k": "sat_pos_x_m",
-            "Y_k": "sat_pos_y_m",
-            "Z_k": "sat_pos_z_m",
-            "dX_k": "sat_vel_x_mps",
-            "dY_k": "sat_vel_y_mps",
-            "dZ_k": "sat_vel_z_mps",
-        },
+
+def unsupported_orbit_position_and_velocity(df):
+    log.info(
+        f"Ephemeris evaluation not implemented or under development for constellation {df['constellation'].iloc[0]}, skipping"
     )
-    return eph
+    df[
+        [
+            "sat_pos_x_m",
+            "sat_pos_y_m",
+            "sat_pos_z_m",
+            "sat_vel_x_mps",
+            "sat_vel_y_mps",
+            "sat_vel_z_mps",
+        ]
+    ] = np.nan
+    return df
+
+
+orbit_type_2_position_and_velocity_function = {
+    "kepler": kepler_orbit_position_and_velocity,
+    "glonass": glonass_orbit_position_and_velocity,
+    "sbas": sbas_orbit_position_and_velocity,
+}
 
 
 def set_time_of_validity(df):
@@ -408,13 +511,18 @@ def set_time_of_validity(df):
     return df
 
 
-def convert_nav_dataset_to_dataframe(nav_ds):
+def nav_dataset_to_dataframe(nav_ds):
     """convert ephemerides from xarray.Dataset to pandas.DataFrame"""
     df = nav_ds.to_dataframe()
     # Drop ephemerides for which all parameters are NaN, as we cannot compute anything from those
     df = df.dropna(how="all")
-    df = df.reset_index()
-    df["source"] = nav_ds.filename
+    return df.reset_index()
+
+
+def convert_nav_dataframe(df, utc_gpst_leap_seconds):
+    """
+    df: ephemerides as parsed from a RINEX 3 navigation file, one row per ephemeris
+    """
     # georinex adds suffixes to satellite IDs if it sees multiple ephemerides (e.g. F/NAV, I/NAV) for the same
     # satellite and the same timestamp.
     # The downstream code expects three-letter satellite IDs, so remove suffixes.
@@ -458,13 +566,13 @@ def convert_nav_dataset_to_dataframe(nav_ds):
         group["ephemeris_reference_time_isagpst"] = to_isagpst(
             group["ephemeris_reference_time_system_time"],
             group_time_scale,
-            int(nav_ds.attrs["utc_gpst_leap_seconds"]),
+            int(utc_gpst_leap_seconds),
         )
         group["clock_offset_reference_time_system_time"] = group["time"]
         group["clock_reference_time_isagpst"] = to_isagpst(
             group["clock_offset_reference_time_system_time"],
             group_time_scale,
-            int(nav_ds.attrs["utc_gpst_leap_seconds"]),
+            int(utc_gpst_leap_seconds),
         )
         return group
 
@@ -501,9 +609,12 @@ def convert_nav_dataset_to_dataframe(nav_ds):
             "I": "irnss",
         }
     )
-    df = df.reset_index(drop=True)
+    # Sort once here, so that selecting ephemerides for a query does not need to sort them again
+    df = df.sort_values(
+        by="ephemeris_reference_time_isagpst", kind="stable", na_position="last"
+    ).reset_index(drop=True)
     df = compute_gal_inav_fnav_indicators(df)
-    df["frequency_slot"] = df.FreqNum.where(df.sv.str[0] == "R", 1).astype(int)
+    df["frequency_slot"] = df.FreqNum.where(df.constellation == "R", 1).astype(int)
     return df
 
 
@@ -512,7 +623,7 @@ def compute_gal_inav_fnav_indicators(df):
     Based on RINEX 3.05, section A8
     """
     df["fnav_or_inav"] = ""
-    is_gal = df.sv.str[0] == "E"
+    is_gal = df.constellation == "E"
     df.loc[is_gal, "fnav_or_inav_indicator"] = np.bitwise_and(
         df[is_gal].DataSrc.astype(np.uint).to_numpy(), 0b111
     )
@@ -550,16 +661,21 @@ def to_isagpst(time, timescale, gpst_utc_leapseconds):
 @timeit
 def select_ephemerides(df, query):
     df = df[df.ephemeris_reference_time_isagpst.notna()]
-    query = query.sort_values(by="query_time_isagpst")
-    df = df.sort_values(by="ephemeris_reference_time_isagpst")
+    if not query.query_time_isagpst.is_monotonic_increasing:
+        query = query.sort_values(by="query_time_isagpst")
+    else:
+        query = query.copy()
+    if not df.ephemeris_reference_time_isagpst.is_monotonic_increasing:
+        df = df.sort_values(by="ephemeris_reference_time_isagpst")
     # Add fnav/inav indicator to query for to select the FNAV ephemeris for E5b signals, and INAV for other signals
     query["fnav_or_inav"] = ""
-    query.loc[
-        (query.sv.str[0] == "E") & (query.signal.str[1] == "5"), "fnav_or_inav"
-    ] = "fnav"
-    query.loc[
-        (query.sv.str[0] == "E") & (query.signal.str[1] != "5"), "fnav_or_inav"
-    ] = "inav"
+    # Evaluate string predicates on the few distinct satellites and signals instead of every query row
+    svs = pd.Series(query.sv.unique())
+    signals = pd.Series(query.signal.unique())
+    is_gal = query.sv.isin(svs[svs.str[0] == "E"])
+    is_e5 = query.signal.isin(signals[signals.str[1] == "5"])
+    query.loc[is_gal & is_e5, "fnav_or_inav"] = "fnav"
+    query.loc[is_gal & ~is_e5, "fnav_or_inav"] = "inav"
     query = pd.merge_asof(
         query,
         df,
@@ -569,12 +685,12 @@ def select_ephemerides(df, query):
         direction="backward",
     )
     # Compute times w.r.t. orbit and clock reference times used by downstream computations
-    query["query_time_wrt_ephemeris_reference_time_s"] = (
+    query["query_time_wrt_ephemeris_reference_time_s"] = helpers.timedeltas_2_seconds(
         query["query_time_isagpst"] - query["ephemeris_reference_time_isagpst"]
-    ).apply(helpers.timedelta_2_seconds)
-    query["query_time_wrt_clock_reference_time_s"] = (
+    )
+    query["query_time_wrt_clock_reference_time_s"] = helpers.timedeltas_2_seconds(
         query["query_time_isagpst"] - query["clock_reference_time_isagpst"]
-    ).apply(helpers.timedelta_2_seconds)
+    )
     query["ephemeris_valid"] = (query["query_time_isagpst"] < query["validity_end"]) & (
         query["query_time_isagpst"] > query["validity_start"]
     )
@@ -582,27 +698,34 @@ def select_ephemerides(df, query):
 
 
 def compute_clock_offsets(df):
+    dt = df["query_time_wrt_clock_reference_time_s"].to_numpy()
+    a0 = df["SVclockBias"].to_numpy()
+    a1 = df["SVclockDrift"].to_numpy()
+    a2 = df["SVclockDriftRate"].to_numpy()
+    # Horner's scheme for the second-order clock polynomial
     df["sat_clock_offset_m"] = constants.cGpsSpeedOfLight_mps * (
-        df["SVclockBias"]
-        + df["SVclockDrift"] * df["query_time_wrt_clock_reference_time_s"]
-        + df["SVclockDriftRate"] * df["query_time_wrt_clock_reference_time_s"] ** 2
-    )
-    df["sat_clock_drift_mps"] = constants.cGpsSpeedOfLight_mps * (
-        df["SVclockDrift"]
-        + 2 * df["SVclockDriftRate"] * df["query_time_wrt_clock_reference_time_s"]
+        (a2 * dt + a1) * dt + a0
     )
+    df["sat_clock_drift_mps"] = constants.cGpsSpeedOfLight_mps * (2 * a2 * dt + a1)
     return df
 
 
 def compute_parallel(rinex_nav_file_path, per_signal_query):
-    # Warm up nav file parser cache so that we don't parse the file multiple times
-    _ = parse_rinex_nav_file(rinex_nav_file_path)
-    parallel = Parallel(n_jobs=round(multiprocessing.cpu_count() / 2), return_as="list")
+    query_columns = per_signal_query.columns
+    # Select ephemerides in this process, so that workers receive only the query rows and their
+    # ephemerides instead of each loading the entire navigation file
+    per_signal_query = select_ephemerides(
+        parse_rinex_nav_file(Path(rinex_nav_file_path)), per_signal_query
+    )
+    parallel = Parallel(
+        n_jobs=max(1, round(multiprocessing.cpu_count() / 2)), return_as="list"
+    )
     # split dataframe into `n_chunks` smaller dataframes
     n_chunks = min(len(per_signal_query.index), 4)
     chunks = np.array_split(per_signal_query, n_chunks)
     processed_chunks = parallel(
-        delayed(compute)(rinex_nav_file_path, chunk) for chunk in chunks
+        delayed(compute_with_selected_ephemerides)(chunk, query_columns)
+        for chunk in chunks
     )
     return pd.concat(processed_chunks)
 
@@ -622,31 +745,35 @@ def compute(rinex_nav_file_path, per_signal_query):
     # Example: Galileo transmits E5a clock and group delay parameters in the F/NAV message, but parameters for other
     # signals in the I/NAV message
     per_signal_query = select_ephemerides(ephemerides, per_signal_query)
+    return compute_with_selected_ephemerides(per_signal_query, query_columns)
+
+
+def compute_with_selected_ephemerides(per_signal_query, query_columns):
+    # per_signal_query is the output of select_ephemerides, query_columns are the columns of the
+    # query before ephemeris selection
     per_signal_query = compute_clock_offsets(per_signal_query)
-    # Compute orbital states for each satellite only once:
+    # Compute orbital states for each satellite and ephemeris only once. Signals of the same satellite can
+    # use different ephemerides, e.g. Galileo I/NAV and F/NAV.
     per_sat_query = (
-        per_signal_query.groupby(["sv", "query_time_isagpst"]).first().reset_index()
+        per_signal_query.groupby(
+            ["sv", "query_time_isagpst", "ephemeris_hash"], dropna=False
+        )
+        .first()
+        .reset_index()
     )
     per_sat_query = per_sat_query.drop(
         columns=["sat_clock_offset_m", "sat_clock_drift_mps"]
     )
 
-    def evaluate_orbit(sub_df):
-        orbit_type = sub_df["orbit_type"].iloc[0]
-        if orbit_type == "kepler":
-            sub_df = kepler_orbit_position_and_velocity(sub_df)
-        elif orbit_type == "glonass":
-            sub_df = glonass_orbit_position_and_velocity(sub_df)
-        elif orbit_type == "sbas":
-            sub_df = sbas_orbit_position_and_velocity(sub_df)
-        else:
-            log.info(
-                f"Ephemeris evaluation not implemented or under development for constellation {sub_df['constellation'].iloc[0]}, skipping"
-            )
-            sub_df[["x_m", "y_m", "z_m", "dx_mps", "dy_mps", "dz_mps"]] = np.nan
-        return sub_df
-
-    per_sat_query = per_sat_query.groupby("orbit_type").apply(evaluate_orbit)
+    # Evaluate each orbit type on all its satellites at once
+    per_sat_query = pd.concat(
+        [
+            orbit_type_2_position_and_velocity_function.get(
+                orbit_type, unsupported_orbit_position_and_velocity
+            )(sub_df.copy())
+            for orbit_type, sub_df in per_sat_query.groupby("orbit_type")
+        ]
+    )
     per_sat_query = per_sat_query.reset_index(drop=True)
     columns_to_keep = [
         "sv",
@@ -709,57 +836,51 @@ def compute_total_group_delays(
             "J": constants.cQzssSpeedOfLight_mps,
         }
     )
+    query["gamma"] = np.nan
+    query["tgd"] = np.nan
 
-    def compute_tgds(df):
-        assert len(df.constellation.unique()) == 1
-        assert len(df.signal.unique()) == 1
-        df["gamma"] = np.nan
-        df["tgd"] = np.nan
-
-        match df.constellation.values[0]:
-            case "G":
-                df.tgd = df.TGD.values[0]
-                match df.frequency_code.values[0]:
-                    case "1":
-                        df.gamma = 1
-                    case "2":
-                        df.gamma = (
-                            constants.carrier_frequencies_hz()["G"]["L1"][1]
-                            / constants.carrier_frequencies_hz()["G"]["L2"][1]
-                        ) ** 2
-            case "J":
-                df.tgd = df.TGD.values[0]
-                df.gamma = 1
-            case "E":
-                match df.frequency_code.values[0]:
-                    case "1":
-                        df.tgd = df.BGDe5b.values[0]
-                        df.gamma = 1
-                    case "5":
-                        df.tgd = df.BGDe5a.values[0]
-                        df.gamma = (
-                            constants.carrier_frequencies_hz()["E"]["L1"][1]
-                            / constants.carrier_frequencies_hz()["E"]["L5"][1]
-                        ) ** 2
-                    case "7":
-                        df.tgd = df.BGDe5b.values[0]
-                        df.gamma = (
-                            constants.carrier_frequencies_hz()["E"]["L1"][1]
-                            / constants.carrier_frequencies_hz()["E"]["L7"][1]
-                        ) ** 2
-            case "C":
-                df.gamma = 1
-                match df.signal.values[0]:
-                    case "C2I":  # called B1I in Beidou ICD
-                        df.tgd = df.TGD1.values[0]
-                    case "C7I":  # called B2I in Beidou ICD
-                        df.tgd = df.TGD2.values[0]
-                    case "C6I":  # called B3I in Beidou ICD
-                        df.tgd = 0
-        df["sat_code_bias_m"] = df.tgd * df.gamma * df.speedOfLightIcd_mps
-        return df
-
-    query = query.groupby(["signal", "constellation"]).apply(compute_tgds)
+    def set_tgd_and_gamma(selection, tgd_field, gamma):
+        # Only access the TGD field if it is needed, as navigation files without ephemerides for a
+        # constellation do not have that constellation's fields
+        if not selection.any():
+            return
+        query.loc[selection, "tgd"] = (
+            0 if tgd_field is None else query.loc[selection, tgd_field]
+        )
+        query.loc[selection, "gamma"] = gamma
+
+    is_gps = query.constellation == "G"
+    set_tgd_and_gamma(is_gps & (query.frequency_code == "1"), "TGD", 1)
+    set_tgd_and_gamma(
+        is_gps & (query.frequency_code == "2"),
+        "TGD",
+        (
+            constants.carrier_frequency_hz("G", "L1")
+            / constants.carrier_frequency_hz("G", "L2")
+        )
+        ** 2,
+    )
+    set_tgd_and_gamma(query.constellation == "J", "TGD", 1)
+    is_gal = query.constellation == "E"
+    for frequency_code, tgd_field, band in [
+        ("1", "BGDe5b", "L1"),
+        ("5", "BGDe5a", "L5"),
+        ("7", "BGDe5b", "L7"),
+    ]:
+        set_tgd_and_gamma(
+            is_gal & (query.frequency_code == frequency_code),
+            tgd_field,
+            (
+                constants.carrier_frequency_hz("E", "L1")
+                / constants.carrier_frequency_hz("E", band)
+            )
+            ** 2,
+        )
+    is_bds = query.constellation == "C"
+    # called B1I, B2I and B3I in Beidou ICD
+    for signal, tgd_field in [("C2I", "TGD1"), ("C7I", "TGD2"), ("C6I", None)]:
+        set_tgd_and_gamma(is_bds & (query.signal == signal), tgd_field, 1)
+    query["sat_code_bias_m"] = query.tgd * query.gamma * query.speedOfLightIcd_mps
     return query
 
 
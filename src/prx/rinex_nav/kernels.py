@@ -0,0 +1,103 @@
+"""Compiled versions of the innermost loops of broadcast ephemeris evaluation.
+
+numba is an optional dependency: if it is not installed, `numba_available` is False and callers
+use their NumPy implementation instead.
+"""
+
+import logging
+
+import numpy as np
+
+from prx import constants
+
+try:
+    import numba
+
+    # prx logs at DEBUG level, which would include numba's compiler output
+    logging.getLogger("numba").setLevel(logging.WARNING)
+except ImportError:
+    numba = None
+
+numba_available = numba is not None
+
+
+def jit(function):
+    if not numba_available:
+        return function
+    return numba.njit(cache=True)(function)
+
+
+@jit
+def eccentric_anomaly(M, e, tol, max_iter):
+    """Newton iteration for Kepler's equation E - e * sin(E) = M.
+
+    Same iteration and stopping criterion as the NumPy implementation in rinex_nav.evaluate: all
+    elements are updated until the largest update is smaller than `tol`, after at least three
+    iterations. Returns the eccentric anomaly and whether the iteration converged.
+    """
+    E = M.copy()
+    for iteration in range(max_iter):
+        max_abs_delta_E = 0.0
+        for i in range(E.size):
+            delta_E = -(E[i] - e[i] * np.sin(E[i]) - M[i]) / (1 - e[i] * np.cos(E[i]))
+            E[i] += delta_E
+            # Written such that a NaN update prevents convergence, as in the NumPy implementation
+            if np.isnan(delta_E) or abs(delta_E) > max_abs_delta_E:
+                max_abs_delta_E = abs(delta_E)
+        if max_abs_delta_E < tol and iteration > 1:
+            return E, True
+    return E, False
+
+
+@jit
+def glonass_xdot_rtklib(pv, acc_sun_moon, xdot):
+    """Single-satellite version of rinex_nav.evaluate.glonass_xdot_rtklib, writing into `xdot`."""
+    GM_e = constants.cGloMuEarth_m3ps2
+    R_e = constants.cGloEarthSemiMajorAxis_m
+    J_2 = constants.cGloJ2
+    omega_e = constants.cGloOmegaDotEarth_rps
+    r = np.sqrt(pv[0] * pv[0] + pv[1] * pv[1] + pv[2] * pv[2])
+    a = 1.5 * J_2 * GM_e * (R_e**2 / r**5)
+    b = 5 * pv[2] ** 2 / r**2
+    c = -GM_e / r**3 - a * (1 - b)
+    xdot[0] = pv[3]
+    xdot[1] = pv[4]
+    xdot[2] = pv[5]
+    xdot[3] = (c + omega_e**2) * pv[0] + 2 * omega_e * pv[4] + acc_sun_moon[0]
+    xdot[4] = (c + omega_e**2) * pv[1] - 2 * omega_e * pv[3] + acc_sun_moon[1]
+    xdot[5] = (c - 2 * a) * pv[2] + acc_sun_moon[2]
+
+
+@jit
+def glonass_orbit_rk4(pv, a, t_query, fixed_integration_time_step):
+    """4th order Runge-Kutta integration of GLONASS orbits, one satellite at a time.
+
+    Same fixed integration steps as the NumPy implementation in rinex_nav.evaluate: steps of
+    `fixed_integration_time_step` seconds followed by a last, shorter step up to the query time.
+    """
+    pv = pv.copy()
+    k1 = np.empty(6)
+    k2 = np.empty(6)
+    k3 = np.empty(6)
+    k4 = np.empty(6)
+    x = np.empty(6)
+    for i in range(pv.shape[0]):
+        t = 0.0
+        while True:
+            h = min(max(t_query[i] - t, 0.0), fixed_integration_time_step)
+            if h == 0:
+                break
+            glonass_xdot_rtklib(pv[i], a[i], k1)
+            for j in range(6):
+                x[j] = pv[i, j] + k1[j] * (h / 2)
+            glonass_xdot_rtklib(x, a[i], k2)
+            for j in range(6):
+                x[j] = pv[i, j] + k2[j] * (h / 2)
+            glonass_xdot_rtklib(x, a[i], k3)
+            for j in range(6):
+                x[j] = pv[i, j] + k3[j] * h
+            glonass_xdot_rtklib(x, a[i], k4)
+            for j in range(6):
+                pv[i, j] = pv[i, j] + (k1[j] + 2 * k2[j] + 2 * k3[j] + k4[j]) * (h / 6)
+            t = t + h
+    return pv
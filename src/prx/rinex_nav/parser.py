@@ -0,0 +1,239 @@
+import numpy as np
+import pandas as pd
+
+from prx import constants
+
+# Field names of the broadcast orbit records, see tables A6 to A19 in the RINEX 3.05 specification.
+# We use the same names as georinex, so that downstream code works with both parsers.
+kepler_fields = [
+    "SVclockBias",
+    "SVclockDrift",
+    "SVclockDriftRate",
+    "IODE",
+    "Crs",
+    "DeltaN",
+    "M0",
+    "Cuc",
+    "Eccentricity",
+    "Cus",
+    "sqrtA",
+    "Toe",
+    "Cic",
+    "Omega0",
+    "Cis",
+    "Io",
+    "Crc",
+    "omega",
+    "OmegaDot",
+    "IDOT",
+]
+gps_fields = kepler_fields + [
+    "CodesL2",
+    "GPSWeek",
+    "L2Pflag",
+    "SVacc",
+    "health",
+    "TGD",
+    "IODC",
+    "TransTime",
+    "FitIntvl",
+    "spare0",
+    "spare1",
+]
+constellation_2_fields = {
+    "G": gps_fields,
+    "J": gps_fields,
+    "C": ["AODE" if field == "IODE" else field for field in kepler_fields]
+    + [
+        "spare0",
+        "BDTWeek",
+        "spare1",
+        "SVacc",
+        "SatH1",
+        "TGD1",
+        "TGD2",
+        "TransTime",
+        "AODC",
+        "spare2",
+        "spare3",
+    ],
+    "E": ["IODnav" if field == "IODE" else field for field in kepler_fields]
+    + [
+        "DataSrc",
+        "GALWeek",
+        "spare0",
+        "SISA",
+        "health",
+        "BGDe5a",
+        "BGDe5b",
+        "TransTime",
+        "spare1",
+        "spare2",
+        "spare3",
+    ],
+    "I": ["IODEC" if field == "IODE" else field for field in kepler_fields]
+    + [
+        "spare0",
+        "BDTWeek",
+        "spare1",
+        "URA",
+        "health",
+        "TGD",
+        "spare2",
+        "TransTime",
+        "spare3",
+        "spare4",
+        "spare5",
+    ],
+    "R": [
+        "SVclockBias",
+        "SVrelFreqBias",
+        "MessageFrameTime",
+        "X",
+        "dX",
+        "dX2",
+        "health",
+        "Y",
+        "dY",
+        "dY2",
+        "FreqNum",
+        "Z",
+        "dZ",
+        "dZ2",
+        "AgeOpInfo",
+    ],
+    "S": [
+        "SVclockBias",
+        "SVrelFreqBias",
+        "MessageFrameTime",
+        "X",
+        "dX",
+        "dX2",
+        "health",
+        "Y",
+        "dY",
+        "dY2",
+        "URA",
+        "Z",
+        "dZ",
+        "dZ2",
+        "IODN",
+    ],
+}
+# Fields of records we parse but do not return
+ignored_fields = ["FitIntvl"]
+# GLONASS and SBAS positions, velocities and accelerations are given in kilometers
+kilometer_fields = ["X", "dX", "dX2", "Y", "dY", "dY2", "Z", "dZ", "dZ2"]
+# See table A4 in the RINEX 3.05 specification: the epoch line starts with satellite and epoch,
+# followed by three fields, continuation lines start with four spaces, followed by four fields.
+epoch_line_data_start = 23
+continuation_line_data_start = 4
+line_length = 80
+field_length = 19
+
+
+def get_fields(constellation, number_of_values):
+    """
+    Returns the field names of a record of `constellation` with `number_of_values` values.
+    Some files do not contain spare fields: we drop trailing spare fields first, then spare fields in
+    the middle of the record, starting from the end.
+    GLONASS records of RINEX 3.05 have an additional line with status flags, which we do not parse.
+    """
+    if constellation not in constellation_2_fields:
+        raise ValueError(f"Unsupported constellation {constellation}")
+    fields = constellation_2_fields[constellation]
+    if number_of_values >= len(fields):
+        return fields
+    fields = fields.copy()
+    while len(fields) > number_of_values and fields[-1].startswith("spare"):
+        fields.pop()
+    spare_fields = [field for field in fields if field.startswith("spare")]
+    while len(fields) > number_of_values and len(spare_fields) > 0:
+        fields.remove(spare_fields.pop())
+    if len(fields) != number_of_values:
+        raise ValueError(
+            f"Unexpected number of values {number_of_values} in constellation {constellation} record"
+        )
+    return fields
+
+
+def parse_values(records, fields):
+    width = len(fields) * field_length
+    values = (
+        records.str.pad(width, side="right")
+        .str[:width]
+        .to_numpy()
+        .astype(f"U{width}")
+        .view(f"U{field_length}")
+        .reshape(len(records), len(fields))
+    )
+    values = pd.DataFrame(values, columns=fields, index=records.index)
+    values = values.drop(
+        columns=[
+            field
+            for field in fields
+            if field.startswith("spare") or field in ignored_fields
+        ]
+    )
+    return values.apply(
+        lambda column: pd.to_numeric(column.str.strip(), errors="coerce")
+    )
+
+
+def parse(file_path):
+    with open(file_path) as f:
+        lines = pd.Series(f.read().splitlines())
+    is_end_of_header = lines.str.contains("END OF HEADER")
+    if not is_end_of_header.any():
+        raise ValueError(f"No END OF HEADER line in {file_path}")
+    lines = lines.iloc[is_end_of_header.idxmax() + 1 :]
+    lines = lines[lines.str.strip() != ""].str[:line_length]
+    # Each record starts with a line containing satellite and epoch, followed by continuation lines
+    is_epoch_line = lines.str[0].isin(list(constellation_2_fields.keys()))
+    if not is_epoch_line.any():
+        raise ValueError(f"No ephemeris records in {file_path}")
+    record_id = is_epoch_line.cumsum()
+    is_last_line = record_id != record_id.shift(-1)
+    data = lines.str[continuation_line_data_start:]
+    data[is_epoch_line] = lines[is_epoch_line].str[epoch_line_data_start:]
+    # Pad all lines but the last one of each record, so that values keep their position in the record
+    # if a line omits trailing blank fields. The length of the last line tells us which fields are present.
+    padded_data = data.str.pad(line_length - continuation_line_data_start, side="right")
+    padded_data[is_epoch_line] = data[is_epoch_line].str.pad(
+        line_length - epoch_line_data_start, side="right"
+    )
+    data = data.where(is_last_line, padded_data)
+    # Drop lines preceding the first record
+    data = data[record_id > 0]
+    epoch_lines = lines[is_epoch_line]
+    records = pd.DataFrame(
+        {
+            "time": pd.to_datetime(
+                epoch_lines.str[4:23], format="%Y %m %d %H %M %S"
+            ).to_numpy(),
+            "sv": epoch_lines.str[:3].str.replace(" ", "0").to_numpy(),
+            "records": data.groupby(record_id[record_id > 0])
+            .agg("".join)
+            .str.replace("D", "E")
+            .to_numpy(),
+        }
+    )
+    records["number_of_values"] = np.ceil(
+        records.records.str.len() / field_length
+    ).astype(int)
+    ephemerides = []
+    for (constellation, number_of_values), group in records.groupby(
+        [records.sv.str[0], "number_of_values"]
+    ):
+        values = parse_values(
+            group.records, get_fields(constellation, number_of_values)
+        )
+        if constellation in ["R", "S"]:
+            values[kilometer_fields] *= constants.cMetersPerKilometer
+        values.insert(0, "sv", group.sv)
+        values.insert(0, "time", group.time)
+        ephemerides.append(values)
+    df = pd.concat(ephemerides).sort_values(by=["time", "sv"], kind="stable")
+    # Drop ephemerides for which all parameters are NaN, as georinex does
+    df = df.dropna(how="all", subset=df.columns[2:]).reset_index(drop=True)
+    return df
@@ -5,6 +5,7 @@ from pathlib import Path
 from prx.rinex_nav.evaluate import select_ephemerides, set_time_of_validity
 from prx.sp3 import evaluate as sp3_evaluate
 from prx.rinex_nav import evaluate as rinex_nav_evaluate
+from prx.rinex_nav import kernels
 from prx import constants, converters, helpers
 from prx.helpers import week_and_seconds_2_timedelta
 import shutil
@@ -31,16 +32,11 @@ expected_max_differences_broadcast_vs_precise = {
 }
 
 
-@pytest.fixture
-def input_for_test():
-    test_directory = (
-        Path(__file__).parent.joinpath(f"./tmp_test_directory_{__name__}").resolve()
-    )
-    if test_directory.exists():
-        # Start from empty directory, might avoid hiding some subtle bugs, e.g.
-        # file decompression not working properly
-        shutil.rmtree(test_directory)
-    os.makedirs(test_directory)
+# Session scope: the tests using these files only read them, and sharing them lets the in-memory cache
+# of parsed navigation files avoid parsing the same file once per test.
+@pytest.fixture(scope="session")
+def input_for_test(tmp_path_factory):
+    test_directory = tmp_path_factory.mktemp(f"tmp_test_directory_{__name__}")
     test_files = {
         "rinex_nav_file": test_directory / "BRDC00IGS_R_20220010000_01D_MN.zip",
         "sp3_file": test_directory / "WUM0MGXULT_20220010000_01D_05M_ORB.SP3",
@@ -315,9 +311,15 @@ def test_sbas(input_for_test):
     ).abs().max() < 2e3
 
 
+test_directory_2023 = Path(f"./tmp_test_directory_{__name__}").resolve()
+test_datasets_2023 = (
+    helpers.prx_repository_root() / "src/prx/test/datasets/TLSE_2023001"
+)
+
+
 @pytest.fixture
 def set_up_test_2023():
-    test_directory = Path(f"./tmp_test_directory_{__name__}").resolve()
+    test_directory = test_directory_2023
     if test_directory.exists():
         # Make sure the expected files has not been generated before and is still on disk due to e.g. a previous
         # test run having crashed:
@@ -332,11 +334,7 @@ def set_up_test_2023():
     )
 
     for key, test_file in test_files.items():
-        shutil.copy(
-            helpers.prx_repository_root()
-            / f"src/prx/test/datasets/TLSE_2023001/{test_file.name}",
-            test_file,
-        )
+        shutil.copy(test_datasets_2023 / test_file.name, test_file)
         assert test_file.exists()
 
     yield dict(test_files)
@@ -430,7 +428,58 @@ def max_abs_diff_smaller_than(a, b, threshold):
     return np.max(np.abs(a - b)) < threshold
 
 
-def test_gps_group_delay(input_for_test):
+gps_group_delay_codes = ["C1C", "C1P", "C2P", "C5X"]
+gps_group_delay_times = [
+    pd.Timestamp("2022-01-01T00:00:00.000000000"),
+    pd.Timestamp("2022-01-01T01:30:00.000000000"),
+    pd.Timestamp("2022-01-01T02:15:00.000000000"),
+]
+gal_group_delay_codes = ["C1C", "C5X", "C7X", "C6B"]
+bds_group_delay_codes = [
+    "C2I",  # B1I -> C2I
+    "C7I",  # B2I -> C7I
+    "C6I",  # B3I -> C6I
+    "C1D",  # B1Cd -> C1D
+    "C1P",  # B1Cp -> C1P
+    "C7D",  # B2bi -> C7D
+]
+
+
+@pytest.fixture(scope="module")
+def group_delays(input_for_test):
+    """Evaluates the queries of the GPS, Galileo and Beidou group delay tests below at once, so that
+    the navigation file is converted and evaluated only once for the three tests."""
+    rinex_3_navigation_file = converters.anything_to_rinex_3(
+        input_for_test["rinex_nav_file"]
+    )
+    query = pd.DataFrame(
+        [
+            {"sv": "G02", "signal": code, "query_time_isagpst": time}
+            for code, time in itertools.product(
+                gps_group_delay_codes, gps_group_delay_times
+            )
+        ]
+        + [
+            {
+                "sv": "E25",
+                "signal": code,
+                "query_time_isagpst": pd.Timestamp("2022-01-01T01:30:00.000000000"),
+            }
+            for code in gal_group_delay_codes
+        ]
+        + [
+            {
+                "sv": "C01",
+                "signal": code,
+                "query_time_isagpst": pd.Timestamp("2022-01-01T00:30:00.000000000"),
+            }
+            for code in bds_group_delay_codes
+        ]
+    )
+    return rinex_nav_evaluate.compute_parallel(rinex_3_navigation_file, query)
+
+
+def test_gps_group_delay(group_delays):
     """
     Computes the total group delay (TGD) for GPS from a RNX3 NAV file containing the ephemerides pasted below.
     The RINEX navigation message field containing TGD is highlighted between **
@@ -457,33 +506,14 @@ def test_gps_group_delay(input_for_test):
          2.000000000000e+00 0.000000000000e+00**-1.769512891769e-08** 4.200000000000e+01
          5.184180000000e+05 4.000000000000e+00 0.000000000000e+00 0.000000000000e+00
     """
-    rinex_3_navigation_file = converters.anything_to_rinex_3(
-        input_for_test["rinex_nav_file"]
-    )
-    # Retrieve total group delays for 4 different observation codes, at 3 different times
-    codes = ["C1C", "C1P", "C2P", "C5X"]
-    times = [
-        pd.Timestamp("2022-01-01T00:00:00.000000000"),
-        pd.Timestamp("2022-01-01T01:30:00.000000000"),
-        pd.Timestamp("2022-01-01T02:15:00.000000000"),
-    ]
-    query = pd.DataFrame()
-    for code, time in itertools.product(codes, times):
-        query = pd.concat(
-            [
-                query,
-                pd.DataFrame(
-                    [{"sv": "G02", "signal": code, "query_time_isagpst": time}]
-                ),
-            ]
-        )
-    tgds = rinex_nav_evaluate.compute_parallel(rinex_3_navigation_file, query)
+    # Total group delays for 4 different observation codes, at 3 different times
+    tgds = group_delays[group_delays.sv == "G02"]
     # Verify that rows are in chronological order
-    for code in codes:
+    for code in gps_group_delay_codes:
         assert (
             tgds[tgds.signal == code]["query_time_isagpst"]
             .reset_index(drop=True)
-            .equals(pd.Series(times))
+            .equals(pd.Series(gps_group_delay_times))
         )
     assert max_abs_diff_smaller_than(
         tgds[tgds.signal == "C1C"]["sat_code_bias_m"],
@@ -511,7 +541,7 @@ def test_gps_group_delay(input_for_test):
     assert np.all(np.isnan(tgds[tgds.signal == "C5X"]["sat_code_bias_m"].to_numpy()))
 
 
-def test_gal_group_delay(input_for_test):
+def test_gal_group_delay(group_delays):
     """
     Note that both ephemerides have the same Toe (reference time), but one is I/NAV, the
     other F/NAV. This test implicitly checks whether the right ephemeris is used wben computing
@@ -534,28 +564,7 @@ def test_gal_group_delay(input_for_test):
          3.120000000000e+00 0.000000000000e+00 **4.423782229420e-09** **4.889443516730e-09**
          5.190640000000e+05
     """
-    rinex_3_navigation_file = converters.anything_to_rinex_3(
-        input_for_test["rinex_nav_file"]
-    )
-    query = pd.DataFrame()
-    codes = ["C1C", "C5X", "C7X", "C6B"]
-    for code in codes:
-        code_query = pd.DataFrame(
-            [
-                {
-                    "sv": "E25",
-                    "signal": code,
-                    "query_time_isagpst": pd.Timestamp("2022-01-01T01:30:00.000000000"),
-                }
-            ]
-        )
-        query = pd.concat(
-            [
-                query,
-                code_query,
-            ]
-        )
-    tgds = rinex_nav_evaluate.compute_parallel(rinex_3_navigation_file, query)
+    tgds = group_delays[group_delays.sv == "E25"]
     assert max_abs_diff_smaller_than(
         tgds[tgds.signal == "C1C"]["sat_code_bias_m"],
         4.889443516730e-09 * constants.cGpsSpeedOfLight_mps,
@@ -586,7 +595,7 @@ def test_gal_group_delay(input_for_test):
     assert np.all(np.isnan(tgds[tgds.signal == "C6B"]["sat_code_bias_m"].to_numpy()))
 
 
-def test_bds_group_delay(input_for_test):
+def test_bds_group_delay(group_delays):
     """
     C01 2022 01 01 00 00 00-2.854013582692E-04 4.026112776501E-11 0.000000000000E+00
          1.000000000000E+00 7.552500000000E+02-4.922705050425E-09 5.928667085353E-01
@@ -605,34 +614,7 @@ def test_bds_group_delay(input_for_test):
          2.000000000000E+00 0.000000000000E+00**-5.800000000000E-09-1.020000000000E-08**
          5.220276000000E+05 0.000000000000E+00
     """
-    rinex_3_navigation_file = converters.anything_to_rinex_3(
-        input_for_test["rinex_nav_file"]
-    )
-    query = pd.DataFrame()
-    codes = [
-        "C2I",  # B1I -> C2I
-        "C7I",  # B2I -> C7I
-        "C6I",  # B3I -> C6I
-        "C1D",  # B1Cd -> C1D
-        "C1P",  # B1Cp -> C1P
-        "C7D",  # B2bi -> C7D
-    ]
-    for code in codes:
-        code_query = pd.DataFrame(
-            {
-                "sv": "C01",
-                "signal": code,
-                "query_time_isagpst": pd.Timestamp("2022-01-01T00:30:00.000000000"),
-            },
-            index=[0],
-        )
-        query = pd.concat(
-            [
-                query,
-                code_query,
-            ]
-        )
-    tgds = rinex_nav_evaluate.compute_parallel(rinex_3_navigation_file, query)
+    tgds = group_delays[group_delays.sv == "C01"]
 
     tgd_c2i_s_expected = -5.800000000000e-09 * constants.cGpsSpeedOfLight_mps
     tgd_c7i_s_expected = -1.020000000000e-08 * constants.cGpsSpeedOfLight_mps
@@ -652,6 +634,88 @@ def test_bds_group_delay(input_for_test):
     assert np.all(np.isnan(tgds[tgds.signal == "C5X"]["sat_code_bias_m"].to_numpy()))
 
 
+def test_signals_using_different_ephemerides_of_one_satellite(input_for_test):
+    # E25 has I/NAV and F/NAV ephemerides with the same reference time: C5X uses the F/NAV ephemeris,
+    # the other signals the I/NAV ephemeris.
+    rinex_3_navigation_file = converters.anything_to_rinex_3(
+        input_for_test["rinex_nav_file"]
+    )
+    codes = ["C1C", "C5X", "C7X"]
+    query = pd.DataFrame(
+        [
+            {
+                "sv": "E25",
+                "signal": code,
+                "query_time_isagpst": pd.Timestamp("2022-01-01T01:30:00.000000000"),
+            }
+            for code in codes
+        ]
+    )
+    sat_states = rinex_nav_evaluate.compute(rinex_3_navigation_file, query)
+    assert sorted(sat_states.signal) == codes
+    assert sat_states.ephemeris_hash.nunique() == 2
+    assert (
+        not sat_states[["sat_pos_x_m", "sat_pos_y_m", "sat_pos_z_m"]].isna().any().any()
+    )
+
+
+def test_group_delays_are_satellite_specific(input_for_test):
+    rinex_3_navigation_file = converters.anything_to_rinex_3(
+        input_for_test["rinex_nav_file"]
+    )
+    query = pd.DataFrame(
+        {
+            "sv": ["G02", "G05", "E02", "E03", "C10", "C11"],
+            "signal": ["C1C", "C1C", "C1C", "C1C", "C2I", "C2I"],
+            "query_time_isagpst": pd.Timestamp("2022-01-01T01:30:00.000000000"),
+        }
+    )
+    tgds = rinex_nav_evaluate.compute_parallel(rinex_3_navigation_file, query.copy())
+    ephemerides = select_ephemerides(
+        rinex_nav_evaluate.parse_rinex_nav_file(rinex_3_navigation_file), query
+    )
+    expected_tgds = ephemerides.TGD.where(
+        ephemerides.sv.str[0] == "G",
+        ephemerides.BGDe5b.where(ephemerides.sv.str[0] == "E", ephemerides.TGD1),
+    )
+    expected_tgds.index = ephemerides.sv
+    tgds = tgds.set_index("sv").loc[expected_tgds.index, "sat_code_bias_m"]
+    # Satellites of the same constellation have different group delays
+    assert expected_tgds.nunique() == len(expected_tgds)
+    assert max_abs_diff_smaller_than(
+        tgds, constants.cGpsSpeedOfLight_mps * expected_tgds, 1e-6
+    )
+
+
+def test_group_delays_without_fields_of_other_constellations():
+    # As parsed from a navigation file with only Galileo ephemerides, i.e. without e.g. the GPS TGD field
+    query = pd.DataFrame(
+        {
+            "sv": ["E01", "E01"],
+            "signal": ["C1C", "C5Q"],
+            "BGDe5a": [2e-9, 2e-9],
+            "BGDe5b": [3e-9, 3e-9],
+        }
+    )
+    tgds = rinex_nav_evaluate.compute_total_group_delays(query)
+    assert max_abs_diff_smaller_than(
+        tgds.sat_code_bias_m,
+        constants.cGalSpeedOfLight_mps
+        * pd.Series(
+            [
+                3e-9,
+                2e-9
+                * (
+                    constants.carrier_frequency_hz("E", "L1")
+                    / constants.carrier_frequency_hz("E", "L5")
+                )
+                ** 2,
+            ]
+        ),
+        1e-6,
+    )
+
+
 def test_select_ephemerides():
     ephemerides = pd.DataFrame(
         {
@@ -693,3 +757,37 @@ def test_select_ephemerides():
         pd.Series([pd.Timedelta("100s"), pd.Timedelta("50s"), pd.Timedelta("90s")])
     )
     assert query_with_ephemerides.ephemeris_hash.equals(pd.Series([1, 2, 2]))
+
+
+def test_eccentric_anomaly_kernel_matches_numpy_implementation(monkeypatch):
+    # Without numba the kernel runs as plain Python, so this also covers environments without numba
+    rng = np.random.default_rng(seed=0)
+    M = rng.uniform(-np.pi, np.pi, 100)
+    e = rng.uniform(0, 0.1, 100)
+    E_kernel, converged = kernels.eccentric_anomaly(M, e, 1e-5, 10)
+    assert converged
+    monkeypatch.setattr(kernels, "numba_available", False)
+    E_numpy = rinex_nav_evaluate.eccentric_anomaly(M, e)
+    assert max_abs_diff_smaller_than(E_kernel, E_numpy, 1e-15)
+    assert max_abs_diff_smaller_than(E_kernel - e * np.sin(E_kernel), M, 1e-12)
+
+
+def test_glonass_rk4_kernel_matches_numpy_implementation():
+    rng = np.random.default_rng(seed=0)
+    n = 10
+    # Circular orbits at GLONASS altitude with random orientation
+    position_m = rng.normal(size=(n, 3))
+    position_m *= 25.5e6 / np.linalg.norm(position_m, axis=1)[:, np.newaxis]
+    velocity_mps = np.cross(position_m, rng.normal(size=(n, 3)))
+    velocity_mps *= 3.9e3 / np.linalg.norm(velocity_mps, axis=1)[:, np.newaxis]
+    pv = np.hstack((position_m, velocity_mps))
+    acc_sun_moon_mps2 = rng.uniform(-3e-6, 3e-6, size=(n, 3))
+    t_query_s = rng.uniform(0, 1800, n)
+    t_query_s[0] = 0
+    pv_kernel = kernels.glonass_orbit_rk4(pv, acc_sun_moon_mps2, t_query_s, 60)
+    pv_numpy = rinex_nav_evaluate.glonass_orbit_rk4(
+        pv, acc_sun_moon_mps2, t_query_s, 60
+    )
+    assert max_abs_diff_smaller_than(pv_kernel[:, :3], pv_numpy[:, :3], 1e-6)
+    assert max_abs_diff_smaller_than(pv_kernel[:, 3:], pv_numpy[:, 3:], 1e-9)
+    assert np.array_equal(pv_kernel[0], pv[0])
@@ -0,0 +1,61 @@
+from pathlib import Path
+import shutil
+
+import georinex
+import pandas as pd
+import pytest
+
+from prx import converters
+from prx.helpers import repair_with_gfzrnx
+from prx.rinex_nav.evaluate import nav_dataset_to_dataframe
+from prx.rinex_nav.parser import get_fields, parse as prx_nav_parse
+
+
+@pytest.mark.parametrize(
+    "nav_file",
+    [
+        "BRDC00IGS_R_20220010000_01D_MN.zip",
+        "BRDC00IGS_R_20230010000_01D_MN.rnx.zip",
+    ],
+)
+def test_compare_to_georinex(tmp_path, nav_file):
+    shutil.copy(Path(__file__).parent / "datasets" / nav_file, tmp_path)
+    file = converters.anything_to_rinex_3(tmp_path / nav_file)
+    repair_with_gfzrnx(file)
+    prx_output = prx_nav_parse(file)
+    georinex_output = nav_dataset_to_dataframe(georinex.load(file))
+    # georinex adds suffixes to satellite IDs of multiple ephemerides with the same timestamp
+    georinex_output["sv"] = georinex_output.sv.str[:3]
+    georinex_output = (
+        georinex_output[prx_output.columns]
+        .sort_values(by=["time", "sv"], kind="stable")
+        .reset_index(drop=True)
+    )
+    assert set(georinex_output.columns) == set(prx_output.columns)
+    pd.testing.assert_frame_equal(georinex_output, prx_output)
+
+
+def test_records_without_spare_fields():
+    assert len(get_fields("G", 31)) == 31
+    assert get_fields("G", 29)[-1] == "FitIntvl"
+    # Beidou records without spare fields
+    assert "spare" not in "".join(get_fields("C", 27))
+    # Galileo records without the spare field after the week number
+    assert get_fields("E", 27)[21:23] == ["GALWeek", "SISA"]
+    with pytest.raises(ValueError):
+        get_fields("G", 20)
+    with pytest.raises(ValueError):
+        get_fields("X", 31)
+
+
+def test_unsupported_files_raise_value_error(tmp_path):
+    # load_rinex_nav_file falls back to georinex on ValueError only
+    header = "     3.04           N: GNSS NAV DATA    M: MIXED            RINEX VERSION / TYPE\n"
+    file = tmp_path / "no_end_of_header.rnx"
+    file.write_text(header)
+    with pytest.raises(ValueError):
+        prx_nav_parse(file)
+    file = tmp_path / "no_records.rnx"
+    file.write_text(header + " " * 60 + "END OF HEADER\n")
+    with pytest.raises(ValueError):
+        prx_nav_parse(file)
@@ -33,8 +33,8 @@ def parse_sp3_file(file_path: Path):
             if "position" not in col and "velocity" not in col:
                 df.rename(columns={col: col.replace("_x", "")}, inplace=True)
         # Convert timestamps to seconds since GPST epoch
-        df["gpst_s"] = (df["time"] - constants.cGpstUtcEpoch).apply(
-            helpers.timedelta_2_seconds
+        df["gpst_s"] = helpers.timedeltas_2_seconds(
+            df["time"] - constants.cGpstUtcEpoch
         )
         df.drop(columns=["time"], inplace=True)
         df["sat_clock_offset_m"] = (
@@ -0,0 +1,35 @@
+import numpy as np
+
+from prx import constants
+
+
+def test_carrier_frequency_table_matches_carrier_frequency_dictionary():
+    carrier_frequencies = constants.carrier_frequencies_hz()
+    for constellation, bands in carrier_frequencies.items():
+        for band, slot_2_frequency in bands.items():
+            for frequency_slot, frequency_hz in slot_2_frequency.items():
+                assert (
+                    constants.carrier_frequency_hz(constellation, band, frequency_slot)
+                    == frequency_hz
+                )
+
+
+def test_carrier_frequency_lookup_on_arrays():
+    frequencies_hz = constants.carrier_frequency_hz(
+        np.array(["G", "R", "R", "R", "R", "X"]),
+        np.array(["L1", "L1", "L1", "L3", "L1", "L1"]),
+        np.array([1, -7, 12, 3, np.nan, 1]),
+    )
+    expected_hz = np.array(
+        [
+            1575.42 * constants.cHzPerMhz,
+            (1602 - 7 * 9 / 16) * constants.cHzPerMhz,
+            (1602 + 12 * 9 / 16) * constants.cHzPerMhz,
+            # GLONASS CDMA signals do not depend on the frequency slot
+            1202.025 * constants.cHzPerMhz,
+            # Unknown frequency slot, unknown constellation
+            np.nan,
+            np.nan,
+        ]
+    )
+    np.testing.assert_array_equal(frequencies_hz, expected_hz)
@@ -56,3 +56,28 @@ def test_converting_file_that_cannot_be_converted(set_up_test):
         )
         is None
     )
+
+
+@pytest.mark.parametrize(
+    "compressed_file",
+    [
+        "TLSE_2022001/TLSE00FRA_R_20220010000_01H_30S_MO.rnx.gz",
+        "TLSE_2023001/BRDC00IGS_R_20230010000_01D_MN.rnx.zip",
+    ],
+)
+def test_uncompressing_replaces_stale_uncompressed_file(set_up_test, compressed_file):
+    compressed_file = Path(
+        shutil.copy(
+            helpers.prx_repository_root() / f"src/prx/test/datasets/{compressed_file}",
+            set_up_test["test_directory"],
+        )
+    )
+    uncompressed_file = converters.compressed_to_uncompressed(compressed_file)
+    content = uncompressed_file.read_bytes()
+    # A stale uncompressed file newer than the archive, e.g. after the archive was replaced by a copy
+    # with preserved, older modification time
+    uncompressed_file.write_bytes(b"OLD")
+    os.utime(compressed_file, ns=(0, 0))
+    assert converters.compressed_to_uncompressed(compressed_file) == uncompressed_file
+    assert uncompressed_file.read_bytes() == content
+    assert not list(set_up_test["test_directory"].glob("*.part"))
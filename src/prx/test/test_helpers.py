@@ -327,6 +327,38 @@ def test_timedelta_2_weeks_and_seconds():
     assert seconds_of_week_expected == seconds_of_week_expected
 
 
+def test_timedeltas_2_seconds():
+    time_deltas = pd.Series(
+        [
+            pd.Timedelta(0),
+            pd.Timedelta(1, "ns"),
+            pd.Timedelta(-1500, "ms"),
+            pd.Timestamp("2022-01-01T01:10:00.123456789") - constants.cGpstUtcEpoch,
+            pd.NaT,
+        ]
+    )
+    np.testing.assert_array_equal(
+        helpers.timedeltas_2_seconds(time_deltas).to_numpy(),
+        time_deltas.apply(helpers.timedelta_2_seconds).to_numpy(),
+    )
+
+
+def test_timestamps_2_gpst_weeks_and_seconds():
+    timestamps = pd.Series(
+        [
+            pd.Timestamp("1981-01-21T06:00:00"),
+            pd.Timestamp("1999-09-01T16:10:00"),
+            pd.Timestamp("2022-01-01T01:10:00.123456789"),
+            pd.NaT,
+        ]
+    )
+    weeks, seconds_of_week = helpers.timestamps_2_gpst_weeks_and_seconds(timestamps)
+    np.testing.assert_array_equal(weeks.to_numpy(), [54, 1025, 2190, np.nan])
+    np.testing.assert_array_equal(
+        seconds_of_week.to_numpy(), [280800, 317400, 522600.123456789, np.nan]
+    )
+
+
 def test_compute_gps_leap_seconds():
     # expected GPS leap second come from https://gnsscalc.com/
     test_cases = [
@@ -32,7 +32,7 @@ def spp_vt_lsq(df, p_ecef_m):
     rx_sat_vectors = (
         df[["sat_pos_x_m", "sat_pos_y_m", "sat_pos_z_m"]].to_numpy() - p_ecef_m.T
     )
-    row_sums = np.linalg.norm(rx_sat_vectors, axis=1)
+    row_sums = np.sqrt(np.einsum("ij,ij->i", rx_sat_vectors, rx_sat_vectors))
     unit_vectors = (rx_sat_vectors.T / row_sums).T
     # The next line computes the row-wise dot product of the two matrices
     df["satellite_los_velocities"] = np.sum(
@@ -85,20 +85,16 @@ def spp_pt_lsq(df, dx_convergence_l2=1e-6, max_iterations=10):
     n_iterations = 0
     while solution_increment_l2 > dx_convergence_l2:
         # Compute predicted pseudo-range as geometric distance + receiver clock bias, predicted at x_linearization
-        C_obs_m_predicted = (
-            np.linalg.norm(
-                x_linearization[0:3].T
-                - df[["sat_pos_x_m", "sat_pos_y_m", "sat_pos_z_m"]].to_numpy(),
-                axis=1,
-            )  # geometric distance
-            + np.squeeze(H_clock @ x_linearization[3:])
-        )  # rx to constellation clock bias
-        # compute jacobian matrix
         rx_sat_vectors = (
             df[["sat_pos_x_m", "sat_pos_y_m", "sat_pos_z_m"]].to_numpy()
             - x_linearization[:3].T
         )
-        row_sums = np.linalg.norm(rx_sat_vectors, axis=1)
+        row_sums = np.sqrt(np.einsum("ij,ij->i", rx_sat_vectors, rx_sat_vectors))
+        C_obs_m_predicted = (
+            row_sums  # geometric distance
+            + np.squeeze(H_clock @ x_linearization[3:])
+        )  # rx to constellation clock bias
+        # compute jacobian matrix
         unit_vectors = (rx_sat_vectors.T / row_sums).T
         # One clock offset per constellation
         H = np.hstack((-unit_vectors, H_clock))